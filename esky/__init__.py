@@ -157,6 +157,7 @@ from esky.util import (split_app_version, join_app_version,
                        copy_ownership_info, lock_version_dir, ESKY_CONTROL_DIR,
                        files_differ, lazy_import, ESKY_APPDATA_DIR,
                        get_all_versions, is_locked_version_dir,
+                       is_network_fs, list_version_dir_sentinels,
                        is_installed_version_dir, really_rmtree, really_rename)
 
 #  Since all frozen apps are required to import this module and call the
@@ -182,6 +183,12 @@ def time():
     return time
 
 
+@lazy_import
+def shutil():
+    import shutil
+    return shutil
+
+
 @lazy_import
 def subprocess():
     import subprocess
@@ -200,6 +207,12 @@ def base64():
     return base64
 
 
+@lazy_import
+def json():
+    import json
+    return json
+
+
 @lazy_import
 def pickle():
     try:
@@ -218,6 +231,15 @@ def threading():
     return threading
 
 
+@lazy_import
+def futures():
+    try:
+        from concurrent import futures
+    except ImportError:
+        futures = None
+    return futures
+
+
 @lazy_import
 def esky():
     import esky
@@ -228,6 +250,56 @@ def esky():
     return esky
 
 
+#  parse_version() tokenizes its argument into a comparison key each time
+#  it's called, and the same version strings come up again and again when
+#  searching for updates.  Memoize the parses; the universe of version
+#  strings seen by one process is small.
+_version_parse_cache = {}
+
+
+def _parse_version_cached(s):
+    try:
+        return _version_parse_cache[s]
+    except KeyError:
+        return _version_parse_cache.setdefault(s, parse_version(s))
+
+
+#  Thread-local cache for lock-ownership ids; created on first use so
+#  that merely importing this module doesn't touch the threading module.
+_tls = None
+
+
+def _get_lock_id():
+    """Get the unique lock-ownership id for the calling thread.
+
+    This is a hostname/pid/threadid string.  It never changes for the
+    life of a thread, but computing it costs a gethostname() syscall, so
+    the result is cached in thread-local storage (keyed on the pid, in
+    case the process forks).
+    """
+    global _tls
+    if threading:
+        if _tls is None:
+            _tls = threading.local()
+        try:
+            (pid, myid) = _tls.lock_id
+            if pid == os.getpid():
+                return myid
+        except AttributeError:
+            pass
+        curthread = threading.currentThread()
+        try:
+            threadid = curthread.ident
+        except AttributeError:
+            threadid = curthread.getName()
+    else:
+        threadid = "0"
+    myid = "%s-%s-%s" % (socket.gethostname(), os.getpid(), threadid)
+    if threading:
+        _tls.lock_id = (os.getpid(), myid)
+    return myid
+
+
 class Esky(object):
     """Class representing an updatable frozen app.
 
@@ -247,14 +319,19 @@ class Esky(object):
     """
 
     lock_timeout = 60*60  # 1 hour timeout on appdir locks
+    find_update_ttl = 60*60  # 1 hour time-to-live on version-finder results
 
-    def __init__(self, appdir_or_exe, version_finder=None):
+    def __init__(self, appdir_or_exe, version_finder=None,
+                 find_update_ttl=None):
         self._init_from_appdir(appdir_or_exe)
         self._lock_count = 0
         self.sudo_proxy = None
         self.keep_sudo_proxy_alive = False
         self._old_sudo_proxies = []
         self.version_finder = version_finder
+        if find_update_ttl is not None:
+            self.find_update_ttl = find_update_ttl
+        self._find_update_cache = None
         self.reinitialize()
 
     def _init_from_appdir(self, appdir_or_exe):
@@ -309,7 +386,7 @@ class Esky(object):
         if self.active_version:
             v = join_app_version(self.name, self.active_version, self.platform)
         else:
-            v = join_app_version(self.name, self.version, self.platform)
+            v = self._current_vdir
         # TODO: remove compatability hooks for ESKY_APPDATA_DIR=""
         if os.path.exists(os.path.join(self._get_versions_dir(), v)):
             return os.path.join(self._get_versions_dir(), v, relpath)
@@ -322,11 +399,44 @@ class Esky(object):
         EskyBrokenError will be raised.  This should never happen unless
         another process has been messing with the files.
         """
+        self._manifest_cache = {}
+        self._best_version_cache = None
+        self._best_version_cache_partial = None
         best_version = get_best_version(self._get_versions_dir())
         if best_version is None:
             raise EskyBrokenError("no frozen versions found")
+        self._best_version_cache = best_version
         details = split_app_version(best_version)
         self.name, self.version, self.platform = details
+        #  join_app_version(name,version,platform) round-trips to the
+        #  best-version dir name, so cache it rather than re-formatting it
+        #  in every method that needs the current version dir.
+        self._current_vdir = best_version
+
+    def _best_version(self, include_partial_installs=False):
+        """Get the best version dir in the appdir, with caching.
+
+        This is get_best_version() on the versions dir, cached until this
+        esky next modifies the appdir.  That's safe because the appdir
+        can't change under us while we hold the lock.
+        """
+        if include_partial_installs:
+            cached = self._best_version_cache_partial
+        else:
+            cached = self._best_version_cache
+        if cached is None:
+            cached = get_best_version(self._get_versions_dir(),
+                                      include_partial_installs)
+            if include_partial_installs:
+                self._best_version_cache_partial = cached
+            else:
+                self._best_version_cache = cached
+        return cached
+
+    def _invalidate_best_version_cache(self):
+        """Forget cached get_best_version() results."""
+        self._best_version_cache = None
+        self._best_version_cache_partial = None
 
     @allow_from_sudo()
     def lock(self, num_retries=0):
@@ -347,36 +457,51 @@ class Esky(object):
             return self.sudo_proxy.lock()
         if num_retries > 5:
             raise EskyLockedError
-        if threading:
-            curthread = threading.currentThread()
-            try:
-                threadid = curthread.ident
-            except AttributeError:
-                threadid = curthread.getName()
-        else:
-            threadid = "0"
-        myid = "%s-%s-%s" % (socket.gethostname(), os.getpid(), threadid)
+        myid = _get_lock_id()
         lockdir = os.path.join(self.appdir, "locked")
-        #  Do I already own the lock?
-        if os.path.exists(os.path.join(lockdir, myid)):
-            #  Update file mtime to keep it safe from breakers
-            os.utime(os.path.join(lockdir, myid), None)
-            self._lock_count += 1
-            return True
-        #  Try to make the "locked" directory.
+        #  Try to make the "locked" directory.  This is the overwhelmingly
+        #  common uncontended case, so try it optimistically before paying
+        #  for any existence checks.
         try:
             os.mkdir(lockdir)
         except OSError, e:
             if e.errno != errno.EEXIST:
                 raise
-            #  Is it stale?  If so, break it and try again.
+            #  Do I already own the lock?
+            if os.path.exists(os.path.join(lockdir, myid)):
+                #  Update file mtime to keep it safe from breakers
+                os.utime(os.path.join(lockdir, myid), None)
+                self._lock_count += 1
+                return True
+            #  Is it stale?  If so, break it and try again.  Any entry with
+            #  a fresh mtime means the lock is still live, so we can stop
+            #  scanning as soon as we see one.  Where available, scandir()
+            #  gives us the mtimes without a separate stat() per entry.
             try:
-                newest_mtime = os.path.getmtime(lockdir)
-                for nm in os.listdir(lockdir):
-                    mtime = os.path.getmtime(os.path.join(lockdir, nm))
-                    if mtime > newest_mtime:
-                        newest_mtime = mtime
-                if newest_mtime + self.lock_timeout < time.time():
+                cutoff = time.time() - self.lock_timeout
+                fresh = os.path.getmtime(lockdir) >= cutoff
+                if not fresh:
+                    scandir = getattr(os, "scandir", None)
+                    if scandir is not None:
+                        entries = scandir(lockdir)
+                        try:
+                            for entry in entries:
+                                if entry.stat().st_mtime >= cutoff:
+                                    fresh = True
+                                    break
+                        finally:
+                            try:
+                                entries.close()
+                            except AttributeError:
+                                pass
+                    else:
+                        for nm in os.listdir(lockdir):
+                            mtime = os.path.getmtime(
+                                        os.path.join(lockdir, nm))
+                            if mtime >= cutoff:
+                                fresh = True
+                                break
+                if not fresh:
                     really_rmtree(lockdir)
                     return self.lock(num_retries+1)
                 else:
@@ -389,6 +514,9 @@ class Esky(object):
             #  Success!  Record my ownership
             open(os.path.join(lockdir, myid), "wb").close()
             self._lock_count = 1
+            #  Anything cached before we held the lock may reflect changes
+            #  made by another process; start the locked pass afresh.
+            self._invalidate_best_version_cache()
             return True
 
     @allow_from_sudo()
@@ -398,15 +526,7 @@ class Esky(object):
             return self.sudo_proxy.unlock()
         self._lock_count -= 1
         if self._lock_count == 0:
-            if threading:
-                curthread = threading.currentThread()
-                try:
-                    threadid = curthread.ident
-                except AttributeError:
-                    threadid = curthread.getName()
-            else:
-                threadid = "0"
-            myid = "%s-%s-%s" % (socket.gethostname(), os.getpid(), threadid)
+            myid = _get_lock_id()
             lockdir = os.path.join(self.appdir, "locked")
             os.unlink(os.path.join(lockdir, myid))
             os.rmdir(lockdir)
@@ -484,6 +604,7 @@ class Esky(object):
             except StopIteration:
                 return success
         finally:
+            self._invalidate_best_version_cache()
             self.unlock()
 
     def needs_cleanup(self):
@@ -494,6 +615,9 @@ class Esky(object):
         might like to use this to avoid locking the appdir (which may require
         elevating to root) when there's nothing to do.
         """
+        #  We don't hold the appdir lock here, so cached scan results
+        #  can't be trusted; scan afresh.
+        self._invalidate_best_version_cache()
         for act in self._cleanup_actions():
             return True
         return False
@@ -507,8 +631,8 @@ class Esky(object):
         """
         appdir = self.appdir
         vsdir = self._get_versions_dir()
-        best_version = get_best_version(vsdir)
-        new_version = get_best_version(vsdir, include_partial_installs=True)
+        best_version = self._best_version()
+        new_version = self._best_version(include_partial_installs=True)
         #  If there's a partial install we must complete it, since it
         #  could have left exes in the bootstrap env and we don't want
         #  to accidentally delete their dependencies.
@@ -539,13 +663,13 @@ class Esky(object):
             manifest.add(self.active_version)
         # TODO: remove compatability hooks for ESKY_APPDATA_DIR=""
         for tdir in (appdir, vsdir):
-            for nm in os.listdir(tdir):
+            for (nm, isdir) in self._list_dir_entries(tdir):
                 if nm not in manifest:
                     fullnm = os.path.join(tdir, nm)
                     if ".old." in nm or nm.endswith(".old"):
                         #  It's a temporary backup file; remove it.
                         yield (self._try_remove, (tdir, nm, manifest,))
-                    elif not os.path.isdir(fullnm):
+                    elif not isdir:
                         #  It's an unaccounted-for file in the bootstrap env.
                         #  Leave it alone.
                         pass
@@ -591,15 +715,51 @@ class Esky(object):
             if self.version_finder.needs_cleanup(self):
                 yield (self.version_finder.cleanup, (self,))
 
+    def _list_dir_entries(self, tdir):
+        """List (name,isdir) pairs for the entries of a directory.
+
+        Where os.scandir() is available the isdir flag comes from the
+        directory read itself, rather than paying a stat() per entry.  The
+        result is materialized as a list so that callers can safely modify
+        the directory while working through it.
+        """
+        entries = []
+        scandir = getattr(os, "scandir", None)
+        if scandir is not None:
+            it = scandir(tdir)
+            try:
+                for entry in it:
+                    entries.append((entry.name, entry.is_dir()))
+            finally:
+                try:
+                    it.close()
+                except AttributeError:
+                    pass
+        else:
+            for nm in os.listdir(tdir):
+                entries.append((nm, os.path.isdir(os.path.join(tdir, nm))))
+        return entries
+
     def _overwrite(self, src, dst):
         """Directly overwrite file 'dst' with the contents of file 'src'."""
         with open(src, "rb") as fIn:
-            with open(dst, "ab") as fOut:
-                fOut.seek(0)
-                chunk = fIn.read(512*16)
-                while chunk:
-                    fOut.write(chunk)
-                    chunk = fIn.read(512*16)
+            with open(dst, "r+b") as fOut:
+                #  Copy in-kernel via sendfile() where the platform supports
+                #  it; otherwise fall back to shutil's buffered copy loop.
+                #  Both avoid dispatching a python-level loop per tiny chunk.
+                try:
+                    size = os.fstat(fIn.fileno()).st_size
+                    offset = 0
+                    while offset < size:
+                        sent = os.sendfile(fOut.fileno(), fIn.fileno(),
+                                           offset, size - offset)
+                        if not sent:
+                            break
+                        offset += sent
+                except (AttributeError, OSError):
+                    fIn.seek(0)
+                    fOut.seek(0)
+                    shutil.copyfileobj(fIn, fOut, 1024*1024)
 
     @allow_from_sudo()
     def cleanup_at_exit(self):
@@ -624,9 +784,7 @@ class Esky(object):
             #  Try to re-launch the best available version, so that
             #  the currently in-use version can be cleaned up.
             if self.active_version is not None:
-                vsdir = self._get_versions_dir()
-                bestver = get_best_version(vsdir,
-                                           include_partial_installs=True)
+                bestver = self._best_version(include_partial_installs=True)
                 if bestver is not None:
                     (_, version, _) = split_app_version(bestver)
                     if self.active_version != version:
@@ -659,7 +817,7 @@ class Esky(object):
                             close_fds=True)
             subprocess.Popen(exe, **kwds)
 
-    def _try_remove(self, tdir, path, manifest=[]):
+    def _try_remove(self, tdir, path, manifest=None):
         """Try to remove the file/directory at given path in the target dir.
 
         This method attempts to remove the file or directory at the given path,
@@ -670,40 +828,120 @@ class Esky(object):
             * if the path appears on sys.path
             * if the path appears in the given manifest
 
+        This is just a thin wrapper that normalizes the manifest and
+        sys.path into frozensets once; the actual walk is done by
+        _try_remove_fast().
+        """
+        if manifest is None:
+            manifest = frozenset()
+        elif not isinstance(manifest, frozenset):
+            manifest = frozenset(manifest)
+        return self._try_remove_fast(tdir, path, manifest,
+                                     frozenset(sys.path))
+
+    def _try_remove_fast(self, tdir, path, manifest, sys_path):
+        """Inner walk for _try_remove, taking pre-frozen membership sets.
+
+        The tree is walked with an explicit stack rather than recursion, so
+        deep directory trees can't exhaust the python stack, and every
+        membership test is an O(1) frozenset lookup.  Plain files within a
+        directory are independent of each other, so they're unlinked
+        through a small thread pool where concurrent.futures is available;
+        the unlink syscalls release the GIL.
         """
-        fullpath = os.path.join(tdir, path)
-        if fullpath in sys.path:
-            return False
-        if path in manifest:
-            return False
+        results = {}
+        stack = [(path, None)]
+        pool = None
         try:
-            if os.path.isdir(fullpath):
-                #  Remove paths starting with "esky" last, since we use
-                #  these to maintain state information.
-                esky_paths = []
-                success = True
-                for nm in os.listdir(fullpath):
-                    if nm == "esky" or nm.startswith("esky-"):
-                        esky_paths.append(nm)
+            while stack:
+                (p, phase) = stack.pop()
+                fullpath = os.path.join(tdir, p)
+                if phase is None:
+                    #  Pre-visit: skip paths in use by the manifest or by the
+                    #  running python; expand directories, remove plain files.
+                    if fullpath in sys_path or p in manifest:
+                        results[p] = False
+                        continue
+                    try:
+                        if os.path.isdir(fullpath):
+                            #  Remove paths starting with "esky" last, since we
+                            #  use these to maintain state information.
+                            esky_nms = []
+                            dir_nms = []
+                            file_nms = []
+                            for (nm, isdir) in self._list_dir_entries(fullpath):
+                                if nm == "esky" or nm.startswith("esky-"):
+                                    esky_nms.append(nm)
+                                elif isdir:
+                                    dir_nms.append(nm)
+                                else:
+                                    file_nms.append(nm)
+                            other_nms = dir_nms + file_nms
+                            stack.append((p, ("check", other_nms, esky_nms)))
+                            for nm in dir_nms:
+                                stack.append((os.path.join(p, nm), None))
+                            if pool is None and futures and len(file_nms) > 1:
+                                pool = futures.ThreadPoolExecutor(max_workers=8)
+                            results.update(self._unlink_files(tdir, p, file_nms,
+                                                              manifest, sys_path,
+                                                              pool))
+                        else:
+                            os.unlink(fullpath)
+                            results[p] = True
+                    except EnvironmentError, e:
+                        if e.errno not in self._errors_to_ignore:
+                            raise
+                        results[p] = False
+                elif phase[0] == "check":
+                    #  Post-visit: only touch the esky state files and the
+                    #  directory itself once all other contents are gone.
+                    (_, other_nms, esky_nms) = phase
+                    if not all(results[os.path.join(p, nm)] for nm in other_nms):
+                        results[p] = False
                     else:
-                        subdir = os.path.join(path, nm)
-                        success &= self._try_remove(tdir, subdir, manifest)
-                if not success:
-                    return False
-                for nm in sorted(esky_paths):
-                    self._try_remove(tdir, os.path.join(path, nm), manifest)
-                os.rmdir(fullpath)
-            else:
+                        stack.append((p, ("rmdir",)))
+                        for nm in sorted(esky_nms, reverse=True):
+                            stack.append((os.path.join(p, nm), None))
+                else:
+                    try:
+                        os.rmdir(fullpath)
+                    except EnvironmentError, e:
+                        if e.errno not in self._errors_to_ignore:
+                            raise
+                        results[p] = False
+                    else:
+                        results[p] = True
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return results[path]
+    _errors_to_ignore = frozenset((errno.ENOENT, errno.EPERM, errno.EACCES,
+                                   errno.ENOTDIR, errno.EISDIR, errno.EINVAL,
+                                   errno.ENOTEMPTY,))
+
+    def _unlink_files(self, tdir, dirpath, names, manifest, sys_path, pool):
+        """Unlink a batch of plain files from a single directory.
+
+        Returns a dict mapping each file's path (relative to 'tdir') to a
+        success flag, applying the same silent-failure rules as
+        _try_remove.  If a thread pool is given the unlinks are issued
+        concurrently; any unexpected error propagates as usual.
+        """
+        def unlink_one(p):
+            fullpath = os.path.join(tdir, p)
+            if fullpath in sys_path or p in manifest:
+                return (p, False)
+            try:
                 os.unlink(fullpath)
-        except EnvironmentError, e:
-            if e.errno not in self._errors_to_ignore:
-                raise
-            return False
-        else:
-            return True
-    _errors_to_ignore = (errno.ENOENT, errno.EPERM, errno.EACCES,
-                         errno.ENOTDIR, errno.EISDIR, errno.EINVAL,
-                         errno.ENOTEMPTY,)
+            except EnvironmentError, e:
+                if e.errno not in self._errors_to_ignore:
+                    raise
+                return (p, False)
+            return (p, True)
+        paths = [os.path.join(dirpath, nm) for nm in names]
+        if pool is not None and len(paths) > 1:
+            return dict(pool.map(unlink_one, paths))
+        return dict(unlink_one(p) for p in paths)
 
     def auto_update(self, callback=None):
         """Automatically install the latest version of the app.
@@ -725,19 +963,41 @@ class Esky(object):
         """
         if self.version_finder is None:
             raise NoVersionFinderError
+        #  Progress callbacks are typically GUI handlers and can't be
+        #  assumed thread-safe, so the threaded fetch path is only used
+        #  when the caller didn't supply one.
+        have_callback = callback is not None
         if callback is None:
             callback = lambda *args: True
         got_root = False
         cleaned = False
         try:
             callback({"status": "searching"})
-            version = self.find_update()
+            prefetch = None
+            fuse = getattr(self.version_finder, "find_and_fetch", None)
+            if fuse is not None and not have_callback and \
+                    self.sudo_proxy is None and \
+                    self._cached_version_list(time.time()) is None:
+                #  The finder can fuse the two network phases, starting
+                #  the download as soon as the listing identifies the
+                #  best candidate.  We await it in _do_auto_update, under
+                #  the local preparatory work.  The fused download reports
+                #  no progress, so it's only used when the caller didn't
+                #  ask for any.
+                now = time.time()
+                (version, prefetch) = fuse(self)
+                versions = [version] if version is not None else []
+                self._find_update_cache = (now, versions)
+                self._save_version_cache(now, versions)
+            else:
+                version = self.find_update()
             if version is not None:
                 callback({"status": "found", "new_version": version})
                 #  Try to install the new version.  If it fails with
                 #  a permission error, escalate to root and try again.
                 try:
-                    self._do_auto_update(version, callback)
+                    self._do_auto_update(version, callback, prefetch,
+                                         threaded=not have_callback)
                 except EnvironmentError:
                     exc_type, exc_value, exc_traceback = sys.exc_info()
                     if exc_value.errno != errno.EACCES or self.has_root():
@@ -748,7 +1008,8 @@ class Esky(object):
                         raise exc_type, exc_value, exc_traceback
                     else:
                         got_root = True
-                        self._do_auto_update(version, callback)
+                        self._do_auto_update(version, callback,
+                                             threaded=not have_callback)
                 self.reinitialize()
             #  Try to clean up the app dir.  If it fails with a
             #  permission error, escalate to root and try again.
@@ -779,13 +1040,51 @@ class Esky(object):
             if got_root:
                 self.drop_root()
 
-    def _do_auto_update(self, version, callback):
+    def _do_auto_update(self, version, callback, prefetch=None,
+                        threaded=False):
         """Actual sequence of operations for auto-update.
 
         This is a separate method so it can easily be retried after gaining
         root privileges.
+
+        When 'threaded' is true (the caller gave no progress callback, so
+        nothing would fire off-thread) and concurrent.futures is available,
+        the download runs in a worker thread while the local filesystem
+        work that install and uninstall will need (manifest parsing,
+        best-version scanning) is warmed up under the tail of the fetch.
+        If the version finder already started the download (via
+        find_and_fetch), 'prefetch' is the future for it and we await that
+        instead of starting our own.
         """
-        self.fetch_version(version, callback)
+        if prefetch is not None:
+            try:
+                self._version_manifest(self._current_vdir)
+                self._best_version(include_partial_installs=True)
+            except Exception:
+                pass
+            try:
+                prefetch.result()
+            except Exception:
+                #  A failed prefetch is not fatal; the fetch below will
+                #  retry the download through the normal path.
+                pass
+            self.fetch_version(version, callback)
+        elif threaded and futures and self.sudo_proxy is None:
+            pool = futures.ThreadPoolExecutor(max_workers=1)
+            try:
+                fetched = pool.submit(self.fetch_version, version, callback)
+                #  Cache-warming only; a failure here must never break
+                #  the update itself.
+                try:
+                    self._version_manifest(self._current_vdir)
+                    self._best_version(include_partial_installs=True)
+                except Exception:
+                    pass
+                fetched.result()
+            finally:
+                pool.shutdown()
+        else:
+            self.fetch_version(version, callback)
         callback({"status": "installing", "new_version": version})
         self.install_version(version)
         try:
@@ -798,17 +1097,111 @@ class Esky(object):
 
         This method returns either None, or a string giving the version of
         the newest available update.
+
+        Since hitting the version finder usually means a network round-trip,
+        the list of available versions is cached for 'find_update_ttl'
+        seconds (both in memory and on disk, so the cache survives process
+        restarts).  Call invalidate_version_cache() to force a fresh poll.
         """
         if self.version_finder is None:
             raise NoVersionFinderError
-        best_version = None
-        best_version_p = parse_version(self.version)
-        for version in self.version_finder.find_versions(self):
-            version_p = parse_version(version)
-            if version_p > best_version_p:
-                best_version_p = version_p
-                best_version = version
-        return best_version
+        now = time.time()
+        cached = self._cached_version_list(now)
+        if cached is not None:
+            return self._best_available_version(cached)
+        find_sorted = getattr(self.version_finder, "find_versions_sorted",
+                              None)
+        if find_sorted is not None:
+            #  The finder can order versions best-first (e.g. server-side),
+            #  so the first one yielded is the answer and we can stop
+            #  without enumerating or parsing the rest.
+            best = next(iter(find_sorted(self)), None)
+            versions = [best] if best is not None else []
+        else:
+            versions = list(self.version_finder.find_versions(self))
+        self._find_update_cache = (now, versions)
+        self._save_version_cache(now, versions)
+        return self._best_available_version(versions)
+
+    def _cached_version_list(self, now):
+        """Get the cached version listing if still fresh, or None.
+
+        A cache loaded from disk hasn't populated the version finder's
+        internal state, so it's only trusted when it says there's no
+        update; otherwise we must poll so the update can be fetched.
+        """
+        cached = self._find_update_cache
+        if cached is not None and now - cached[0] < self.find_update_ttl:
+            return cached[1]
+        cached = self._load_version_cache()
+        if cached is not None and now - cached[0] < self.find_update_ttl:
+            if self._best_available_version(cached[1]) is None:
+                self._find_update_cache = cached
+                return cached[1]
+        return None
+
+    def _best_available_version(self, versions):
+        """Pick the best version newer than the current one, if any."""
+        versions = list(versions)
+        if not versions:
+            return None
+        best_version = max(versions, key=_parse_version_cached)
+        if _parse_version_cached(best_version) > \
+                _parse_version_cached(self.version):
+            return best_version
+        return None
+
+    def invalidate_version_cache(self):
+        """Discard any cached results from the version finder.
+
+        Use this after installing an update out-of-band, so that the next
+        call to find_update() polls the server afresh rather than serving
+        a stale version listing.
+        """
+        self._find_update_cache = None
+        try:
+            os.unlink(self._version_cache_file())
+        except EnvironmentError, e:
+            if e.errno not in (errno.ENOENT, errno.ENOTDIR,):
+                raise
+
+    def _version_cache_file(self):
+        """Get the path of the on-disk version-listing cache file."""
+        return os.path.join(self._get_update_dir(),
+                            ".version-index-cache.json")
+
+    def _load_version_cache(self):
+        """Load the version-listing cache from disk, if it's usable.
+
+        Returns a (timestamp,versions) tuple, or None if there is no cache
+        or it was written for a different download URL.
+        """
+        url = getattr(self.version_finder, "download_url", None)
+        if url is None:
+            return None
+        try:
+            with open(self._version_cache_file(), "rb") as f:
+                data = json.load(f)
+        except (EnvironmentError, ValueError):
+            return None
+        try:
+            if data["url"] != url:
+                return None
+            return (data["timestamp"], list(data["versions"]))
+        except (KeyError, TypeError):
+            return None
+
+    def _save_version_cache(self, timestamp, versions):
+        """Write the version-listing cache to disk; failure is not fatal."""
+        url = getattr(self.version_finder, "download_url", None)
+        if url is None:
+            return
+        data = {"url": url, "timestamp": timestamp, "versions": versions}
+        try:
+            with open(self._version_cache_file(), "wb") as f:
+                json.dump(data, f)
+        except EnvironmentError:
+            pass
 
     def fetch_version(self, version, callback=None):
         """Fetch the specified updated version of the app."""
@@ -829,7 +1222,7 @@ class Esky(object):
         if not loc:
             loc = self.version_finder.fetch_version(self, version, callback)
         #  Adjust permissions to match the current version
-        vdir = join_app_version(self.name, self.version, self.platform)
+        vdir = self._current_vdir
         copy_ownership_info(os.path.join(vsdir, vdir), loc)
         return loc
 
@@ -857,7 +1250,7 @@ class Esky(object):
                 else:
                     loc = status["path"]
         #  Adjust permissions to match the current version
-        vdir = join_app_version(self.name, self.version, self.platform)
+        vdir = self._current_vdir
         copy_ownership_info(os.path.join(vsdir, vdir), loc)
         yield {"status": "ready", "path": loc}
 
@@ -877,9 +1270,11 @@ class Esky(object):
         target = os.path.join(vsdir, target)
         #  Guard against malicious input (might be called with root privs)
         assert os.path.dirname(target) == vsdir
+        source = None
         if not os.path.exists(target):
-            self.fetch_version(version)
-            source = self.version_finder.has_version(self, version)
+            #  fetch_version() checks for an already-fetched copy itself,
+            #  so there's no need for a separate has_version() probe here.
+            source = self.fetch_version(version)
         #  TODO: remove compatability hooks for ESKY_APPDATA_DIR="".
         #  This is our chance to migrate to the new appdata dir layout,
         #  by installing into it.
@@ -895,8 +1290,15 @@ class Esky(object):
             target = os.path.join(vsdir, os.path.basename(target))
         self.lock()
         try:
-            if not os.path.exists(target):
-                really_rename(source, target)
+            if source is not None:
+                #  Rename into place unconditionally; an existing target
+                #  just means another process beat us to it.  This avoids
+                #  a stat-then-rename race along with the extra syscall.
+                try:
+                    really_rename(source, target)
+                except OSError, e:
+                    if e.errno not in (errno.EEXIST, errno.ENOTEMPTY,):
+                        raise
             trn = esky.fstransact.FSTransaction(self.appdir)
             try:
                 self._unpack_bootstrap_env(target, trn)
@@ -906,6 +1308,8 @@ class Esky(object):
             else:
                 trn.commit()
         finally:
+            self._manifest_cache.clear()
+            self._invalidate_best_version_cache()
             self.unlock()
 
     def _unpack_bootstrap_env(self, target, trn):
@@ -914,10 +1318,25 @@ class Esky(object):
         #  Move new bootrapping environment into main app dir.
         #  Be sure to move dependencies before executables.
         bootstrap = os.path.join(target, ESKY_CONTROL_DIR, "bootstrap")
+        #  Rather than stat()ing every manifest entry, read each directory
+        #  once and check for entries by name.  The transaction only queues
+        #  its operations, so the listings stay valid for the whole loop.
+        dir_names = {}
         for nm in self._version_manifest(vdir):
             bssrc = os.path.join(bootstrap, nm)
             bsdst = os.path.join(self.appdir, nm)
-            if os.path.exists(bssrc):
+            bsdir = os.path.dirname(bssrc)
+            try:
+                siblings = dir_names[bsdir]
+            except KeyError:
+                try:
+                    siblings = frozenset(os.listdir(bsdir))
+                except EnvironmentError, e:
+                    if e.errno not in (errno.ENOENT, errno.ENOTDIR,):
+                        raise
+                    siblings = None
+                dir_names[bsdir] = siblings
+            if siblings and os.path.basename(bssrc) in siblings:
                 #  On windows we can't atomically replace files.
                 #  If they differ in a "safe" way we put them aside
                 #  to overwrite at a later time.
@@ -934,9 +1353,8 @@ class Esky(object):
                         trn.move(bssrc, bsdst)
                 else:
                     trn.move(bssrc, bsdst)
-            if os.path.isdir(os.path.dirname(bssrc)):
-                if not os.listdir(os.path.dirname(bssrc)):
-                    trn.remove(os.path.dirname(bssrc))
+            if siblings is not None and not siblings:
+                trn.remove(bsdir)
         #  Remove the bootstrap dir; the new version is now installed
         trn.remove(bootstrap)
 
@@ -989,6 +1407,12 @@ class Esky(object):
                 except EnvironmentError:
                     raise VersionLockedError("version in use: %s" % (version,))
             else:
+                #  On network filesystems new eskys hold sentinel hardlinks,
+                #  but the bootstrap exe and older eskys still hold flock
+                #  locks (which mostly work via NLM), so respect both.
+                on_network_fs = is_network_fs(target)
+                if on_network_fs and list_version_dir_sentinels(target):
+                    raise VersionLockedError("version in use: %s" % (version,))
                 try:
                     f = open(lockfile, "r")
                 except EnvironmentError, e:
@@ -998,33 +1422,46 @@ class Esky(object):
                     try:
                         fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
                     except EnvironmentError, e:
-                        if e.errno not in (errno.EACCES, errno.EAGAIN,):
+                        if e.errno in (errno.EACCES, errno.EAGAIN,):
+                            msg = "version in use: %s" % (version,)
+                            raise VersionLockedError(msg)
+                        if not on_network_fs or e.errno not in \
+                                (errno.ENOSYS, errno.EOPNOTSUPP,):
                             raise
-                        msg = "version in use: %s" % (version,)
-                        raise VersionLockedError(msg)
+                        #  flock can't tell us anything here; the sentinel
+                        #  check above is the best information we have.
+                        really_rename(bsfile, bsfile_old)
                     else:
                         really_rename(bsfile, bsfile_old)
                     finally:
                         f.close()
         finally:
+            self._manifest_cache.clear()
+            self._invalidate_best_version_cache()
             self.unlock()
 
     def _cleanup_bootstrap_env(self, version, trn):
         """Cleanup the bootstrap env populated by the given version."""
         target_name = join_app_version(self.name, version, self.platform)
-        #  Get set of all files that must stay in the main appdir
-        to_keep = set()
+        version_p = _parse_version_cached(version)
+        #  Start from this version's manifest and knock out anything still
+        #  needed by a remaining version.  Subtracting each sibling's
+        #  manifest directly (rather than accumulating a union of them all)
+        #  lets us stop as soon as nothing is left to remove, which is the
+        #  common case when versions share most of their bootstrap files.
+        to_rem = set(self._version_manifest(target_name))
         for vname in os.listdir(self._get_versions_dir()):
+            if not to_rem:
+                break
             if vname == target_name:
                 continue
             details = split_app_version(vname)
             if details[0] != self.name:
                 continue
-            if parse_version(details[1]) < parse_version(version):
+            if _parse_version_cached(details[1]) < version_p:
                 continue
-            to_keep.update(self._version_manifest(vname))
+            to_rem -= self._version_manifest(vname)
         #  Remove files used only by the version being removed
-        to_rem = self._version_manifest(target_name) - to_keep
         for nm in to_rem:
             fullnm = os.path.join(self.appdir, nm)
             if os.path.exists(fullnm):
@@ -1038,7 +1475,14 @@ class Esky(object):
 
         This is the set of files/directories that the given version expects
         to be in the main app directory.
+
+        Since cleanup() et al ask for the same manifests repeatedly, the
+        parsed result is cached until the esky next modifies the appdir.
         """
+        try:
+            return set(self._manifest_cache[vdir])
+        except KeyError:
+            pass
         vsdir = self._get_versions_dir()
         mpath = os.path.join(vsdir, vdir, ESKY_CONTROL_DIR)
         mpath = os.path.join(mpath, "bootstrap-manifest.txt")
@@ -1053,15 +1497,23 @@ class Esky(object):
         manifest = set()
         try:
             with open(mpath, "rt") as mf:
-                for ln in mf:
-                    #  Guard against malicious input, since we might try
-                    #  to manipulate these files with root privs.
-                    nm = os.path.normpath(ln.strip())
-                    assert not os.path.isabs(nm)
-                    assert not nm.startswith("..")
-                    manifest.add(nm)
+                data = mf.read()
         except IOError:
             pass
+        else:
+            #  Read the file in one go and split it in C, rather than
+            #  paying the line-buffered iteration machinery per entry.
+            for ln in data.splitlines():
+                ln = ln.strip()
+                if not ln:
+                    continue
+                #  Guard against malicious input, since we might try
+                #  to manipulate these files with root privs.
+                nm = os.path.normpath(ln)
+                assert not os.path.isabs(nm)
+                assert not nm.startswith("..")
+                manifest.add(nm)
+        self._manifest_cache[vdir] = frozenset(manifest)
         return manifest
 
 
@@ -24,11 +24,16 @@ import tempfile
 import errno
 from urlparse import urlparse, urljoin
 
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
+
 from esky.bootstrap import parse_version, join_app_version
 from esky.errors import *
 from esky.util import deep_extract_zipfile, copy_ownership_info, \
                       ESKY_CONTROL_DIR, ESKY_APPDATA_DIR, \
-                      really_rmtree, really_rename
+                      really_rmtree, really_rename, atomic_exchange
 from esky.patch import apply_patch, PatchError
 
 
@@ -53,6 +58,19 @@ class VersionFinder(object):
 
         needs_cleanup:  check whether maintenance/cleanup tasks are required
 
+    A VersionFinder may also provide the following optional methods:
+
+        find_versions_sorted:  like find_versions, but yielding versions
+                               from best to worst; finders that can order
+                               results (e.g. server-side) let find_update()
+                               stop at the first version yielded instead of
+                               enumerating and parsing the whole listing
+
+        find_and_fetch:  find the best available version and start fetching
+                         it in the background, returning a (version,future)
+                         pair; this lets auto_update() overlap the download
+                         with its own preparatory work
+
     """
 
     def __init__(self):
@@ -117,6 +135,9 @@ class DefaultVersionFinder(VersionFinder):
         self.download_url = download_url
         super(DefaultVersionFinder,self).__init__()
         self.version_graph = VersionGraph()
+        self._version_re_cache = {}
+        self._index_etag = None
+        self._index_last_modified = None
 
     def _workdir(self,app,nm,create=True):
         """Get full path of named working directory, inside the given app."""
@@ -161,8 +182,9 @@ class DefaultVersionFinder(VersionFinder):
         for nm in os.listdir(rddir):
             really_rmtree(os.path.join(rddir,nm))
 
-    def open_url(self,url):
-        f = urllib2.urlopen(url, timeout=30)
+    def open_url(self,url,headers=None):
+        req = urllib2.Request(url,headers=headers or {})
+        f = urllib2.urlopen(req, timeout=30)
         try:
             size = f.headers.get("content-length",None)
             if size is not None:
@@ -173,28 +195,59 @@ class DefaultVersionFinder(VersionFinder):
             f.size = size
         return f
 
+    def _get_link_re(self,app):
+        """Get the compiled regex matching download links for the given app.
+
+        The pattern only depends on the app's name and platform, so it is
+        compiled once and cached rather than rebuilt on every call.
+        """
+        try:
+            return self._version_re_cache[(app.name,app.platform)]
+        except KeyError:
+            version_re = "[a-zA-Z0-9\\.-_]+"
+            appname_re = "(?P<version>%s)" % (version_re,)
+            name_re = "(%s|%s)" % (app.name, urllib.quote(app.name))
+            appname_re = join_app_version(name_re,appname_re,app.platform)
+            filename_re = "%s\\.(zip|exe|from-(?P<from_version>%s)\\.patch)"
+            filename_re = filename_re % (appname_re,version_re,)
+            link_re = "href=['\"](?P<href>([^'\"]*/)?%s)['\"]" % (filename_re,)
+            link_re = re.compile(link_re,re.I)
+            self._version_re_cache[(app.name,app.platform)] = link_re
+            return link_re
+
     def find_versions(self,app):
-        version_re = "[a-zA-Z0-9\\.-_]+"
-        appname_re = "(?P<version>%s)" % (version_re,)
-        name_re = "(%s|%s)" % (app.name, urllib.quote(app.name))
-        appname_re = join_app_version(name_re,appname_re,app.platform)
-        filename_re = "%s\\.(zip|exe|from-(?P<from_version>%s)\\.patch)"
-        filename_re = filename_re % (appname_re,version_re,)
-        link_re = "href=['\"](?P<href>([^'\"]*/)?%s)['\"]" % (filename_re,)
+        link_re = self._get_link_re(app)
         # Read the URL.  If this followed any redirects, update the
-        # recorded URL to match the final endpoint.
-        df = self.open_url(self.download_url)
+        # recorded URL to match the final endpoint.  We send any validators
+        # received on a previous read, so an unchanged index comes back as
+        # a 304 and we can skip re-parsing it.
+        headers = {}
+        if self._index_etag is not None:
+            headers["If-None-Match"] = self._index_etag
+        if self._index_last_modified is not None:
+            headers["If-Modified-Since"] = self._index_last_modified
+        try:
+            df = self.open_url(self.download_url,headers)
+        except urllib2.HTTPError, e:
+            if e.code != 304:
+                raise
+            return self.version_graph.get_versions(app.version)
         try:
             if df.url != self.download_url:
                 self.download_url = df.url
         except AttributeError:
             pass
+        try:
+            self._index_etag = df.headers.get("ETag")
+            self._index_last_modified = df.headers.get("Last-Modified")
+        except AttributeError:
+            pass
         # TODO: would be nice not to have to guess encoding here.
         try:
             downloads = df.read().decode("utf-8")
         finally:
             df.close()
-        for match in re.finditer(link_re,downloads,re.I):
+        for match in link_re.finditer(downloads):
             version = match.group("version")
             href = match.group("href")
             from_version = match.group("from_version")
@@ -206,6 +259,32 @@ class DefaultVersionFinder(VersionFinder):
             self.version_graph.add_link(from_version or "",version,href,cost)
         return self.version_graph.get_versions(app.version)
 
+    def find_and_fetch(self,app):
+        """Find the best available version and start fetching it.
+
+        This fuses the two network phases of an update (reading the version
+        listing, then downloading the update) by kicking off the download
+        on a background thread as soon as the listing has identified the
+        best candidate, returning a (version,future) pair.  The version is
+        None if nothing newer than the app's current version is available;
+        the future is None when concurrent.futures is not available, in
+        which case nothing has been fetched.
+        """
+        best = None
+        best_p = parse_version(app.version)
+        for version in self.find_versions(app):
+            version_p = parse_version(version)
+            if version_p > best_p:
+                best = version
+                best_p = version_p
+        if best is None or futures is None:
+            return (best,None)
+        pool = futures.ThreadPoolExecutor(max_workers=1)
+        try:
+            return (best,pool.submit(self.fetch_version,app,best))
+        finally:
+            pool.shutdown(wait=False)
+
     def fetch_version_iter(self,app,version):
         #  There's always the possibility that a file fails to download or 
         #  that a patch fails to apply.  _fetch_file_iter and _prepare_version
@@ -379,11 +458,18 @@ class DefaultVersionFinder(VersionFinder):
             tmpnm = None
             try:
                 if os.path.exists(rdpath):
-                    tmpnm = rdpath + ".old"
-                    while os.path.exists(tmpnm):
-                        tmpnm = tmpnm + ".old"
-                    really_rename(rdpath,tmpnm)
-                really_rename(vdirpath,rdpath)
+                    #  Swap the new version into place in a single atomic
+                    #  step where the platform allows; the old contents
+                    #  land in the unpack dir, which is removed below
+                    #  anyway.  Otherwise do the rename-aside dance.
+                    if not atomic_exchange(vdirpath,rdpath):
+                        tmpnm = rdpath + ".old"
+                        while os.path.exists(tmpnm):
+                            tmpnm = tmpnm + ".old"
+                        really_rename(rdpath,tmpnm)
+                        really_rename(vdirpath,rdpath)
+                else:
+                    really_rename(vdirpath,rdpath)
             finally:
                 if tmpnm is not None:
                     really_rmtree(tmpnm)
@@ -446,14 +532,23 @@ class LocalVersionFinder(DefaultVersionFinder):
     directory.  It's probably only useful for testing purposes.
     """
 
+    def _get_filename_re(self,app):
+        """Get the compiled regex matching download filenames for an app."""
+        try:
+            return self._version_re_cache[(app.name,app.platform)]
+        except KeyError:
+            version_re = "[a-zA-Z0-9\\.\\-_]+"
+            appname_re = "(?P<version>%s)" % (version_re,)
+            appname_re = join_app_version(app.name,appname_re,app.platform)
+            filename_re = "%s\\.(zip|exe|from-(?P<from_version>%s)\\.patch)"
+            filename_re = re.compile(filename_re % (appname_re,version_re,))
+            self._version_re_cache[(app.name,app.platform)] = filename_re
+            return filename_re
+
     def find_versions(self,app):
-        version_re = "[a-zA-Z0-9\\.\\-_]+"
-        appname_re = "(?P<version>%s)" % (version_re,)
-        appname_re = join_app_version(app.name,appname_re,app.platform)
-        filename_re = "%s\\.(zip|exe|from-(?P<from_version>%s)\\.patch)"
-        filename_re = filename_re % (appname_re,version_re,)
+        filename_re = self._get_filename_re(app)
         for nm in os.listdir(self.download_url):
-            match = re.match(filename_re,nm)
+            match = filename_re.match(nm)
             if match:
                 version = match.group("version")
                 from_version = match.group("from_version")
@@ -464,7 +559,7 @@ class LocalVersionFinder(DefaultVersionFinder):
                 self.version_graph.add_link(from_version or "",version,nm,cost)
         return self.version_graph.get_versions(app.version)
 
-    def open_url(self,url):
+    def open_url(self,url,headers=None):
         return open(os.path.join(self.download_url,url),"rb")
 
 
@@ -10,7 +10,8 @@ import os
 import sys
 import shutil
 
-from esky.util import get_backup_filename, files_differ, really_rename
+from esky.util import get_backup_filename, files_differ, really_rename, \
+                      atomic_exchange
 
 
 class FSTransaction(object):
@@ -83,12 +84,14 @@ class FSTransaction(object):
                     pass
         else:
             target_old = None
-            if os.path.isdir(target) and os.path.isfile(source):
-                target_old = target + ".old"
-                while os.path.exists(target_old):
-                    target_old = target_old + ".old"
-                really_rename(target,target_old)
-            elif os.path.isfile(target) and os.path.isdir(source):
+            if (os.path.isdir(target) and os.path.isfile(source)) or \
+                    (os.path.isfile(target) and os.path.isdir(source)):
+                #  A plain rename can't replace a dir with a file or vice
+                #  versa.  An atomic exchange swaps the two in one step;
+                #  failing that, rename the target out of the way first.
+                if atomic_exchange(source,target):
+                    self._remove(source)
+                    return
                 target_old = target + ".old"
                 while os.path.exists(target_old):
                     target_old = target_old + ".old"
@@ -124,7 +127,7 @@ class FSTransaction(object):
                 self.pending.append(("_copy",source,target))
 
     def _copy(self,source,target):
-        is_win32 = (sys.platform == "win32")
+        is_win32 = (sys.platform == "win32")
         if is_win32 and os.path.exists(target) and target != source:
             target_old = get_backup_filename(target)
             really_rename(target,target_old)
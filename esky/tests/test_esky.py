@@ -24,13 +24,14 @@ from distutils.core import setup as dist_setup
 from distutils import dir_util
 
 import esky
+import esky.finder
 import esky.patch
 import esky.sudo
 from esky import bdist_esky
 from esky.bdist_esky import Executable
 from esky.util import extract_zipfile, deep_extract_zipfile, get_platform, \
                       ESKY_CONTROL_DIR, files_differ, ESKY_APPDATA_DIR, \
-                      really_rmtree
+                      really_rmtree, atomic_exchange
 from esky.fstransact import FSTransaction
 
 try:
@@ -389,6 +390,68 @@ class TestEsky(unittest.TestCase):
         shutil.rmtree(appdir)
 
 
+  def test_esky_find_update_caching(self):
+    """Test that find_update() caches version-finder results."""
+    platform = get_platform()
+    appdir = tempfile.mkdtemp()
+    try:
+        vdir = os.path.join(appdir,ESKY_APPDATA_DIR,"testapp-0.1.%s" % (platform,))
+        os.makedirs(os.path.join(vdir,ESKY_CONTROL_DIR))
+        open(os.path.join(vdir,ESKY_CONTROL_DIR,"bootstrap-manifest.txt"),"wb").close()
+        class CountingVersionFinder(esky.finder.VersionFinder):
+            def __init__(self):
+                self.call_count = 0
+                super(CountingVersionFinder,self).__init__()
+            def find_versions(self,app):
+                self.call_count += 1
+                return ["0.2","0.3"]
+        finder = CountingVersionFinder()
+        app = esky.Esky(appdir,finder)
+        assert app.find_update() == "0.3"
+        assert app.find_update() == "0.3"
+        assert finder.call_count == 1
+        app.invalidate_version_cache()
+        assert app.find_update() == "0.3"
+        assert finder.call_count == 2
+        app.find_update_ttl = 0
+        assert app.find_update() == "0.3"
+        assert finder.call_count == 3
+    finally:
+        shutil.rmtree(appdir)
+
+
+  def test_esky_try_remove(self):
+    """Test the success and failure modes of Esky._try_remove."""
+    platform = get_platform()
+    appdir = tempfile.mkdtemp()
+    try:
+        vdir = os.path.join(appdir,ESKY_APPDATA_DIR,"testapp-0.1.%s" % (platform,))
+        os.makedirs(os.path.join(vdir,ESKY_CONTROL_DIR))
+        open(os.path.join(vdir,ESKY_CONTROL_DIR,"bootstrap-manifest.txt"),"wb").close()
+        app = esky.Esky(appdir,"http://example.com/downloads/")
+        def mkfile(*path):
+            fullnm = os.path.join(appdir,*path)
+            if not os.path.isdir(os.path.dirname(fullnm)):
+                os.makedirs(os.path.dirname(fullnm))
+            open(fullnm,"wb").close()
+        #  A whole tree is removed, esky state files included.
+        mkfile("junk","stuff.txt")
+        mkfile("junk","subdir","more.txt")
+        mkfile("junk","esky-files","state.txt")
+        assert app._try_remove(appdir,"junk")
+        assert not os.path.exists(os.path.join(appdir,"junk"))
+        #  Paths named in the manifest are left alone, along with any
+        #  directories containing them.
+        mkfile("junk2","keep.txt")
+        mkfile("junk2","stuff.txt")
+        manifest = set([os.path.join("junk2","keep.txt")])
+        assert not app._try_remove(appdir,"junk2",manifest)
+        assert os.path.exists(os.path.join(appdir,"junk2","keep.txt"))
+        assert not os.path.exists(os.path.join(appdir,"junk2","stuff.txt"))
+    finally:
+        shutil.rmtree(appdir)
+
+
   def test_README(self):
     """Ensure that the README is in sync with the docstring.
 
@@ -766,6 +829,28 @@ class TestPatch_pybsdiff(TestPatch):
     
         
 
+class TestAtomicExchange(unittest.TestCase):
+
+    def test_atomic_exchange(self):
+        tdir = tempfile.mkdtemp()
+        try:
+            f1 = os.path.join(tdir,"one.txt")
+            f2 = os.path.join(tdir,"two.txt")
+            with open(f1,"wb") as f:
+                f.write("one")
+            with open(f2,"wb") as f:
+                f.write("two")
+            if not atomic_exchange(f1,f2):
+                #  Platform can't do the exchange; the fallbacks apply.
+                return
+            with open(f1,"rb") as f:
+                assert f.read() == "two"
+            with open(f2,"rb") as f:
+                assert f.read() == "one"
+        finally:
+            shutil.rmtree(tdir)
+
+
 class TestFilesDiffer(unittest.TestCase):
 
     def setUp(self):
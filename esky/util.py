@@ -100,6 +100,11 @@ def re():
     import re
     return re
 
+@lazy_import
+def socket():
+    import socket
+    return socket
+
 @lazy_import
 def zipfile():
     import zipfile
@@ -150,12 +155,13 @@ else:
 
 
 from esky.bootstrap import appdir_from_executable as _bs_appdir_from_executable
+from esky.bootstrap import lock_version_dir as _bs_lock_version_dir
+from esky.bootstrap import unlock_version_dir as _bs_unlock_version_dir
 from esky.bootstrap import get_best_version, get_all_versions,\
                            is_version_dir, is_installed_version_dir,\
                            is_uninstalled_version_dir,\
                            split_app_version, join_app_version, parse_version,\
-                           get_original_filename, lock_version_dir,\
-                           unlock_version_dir, fcntl, ESKY_CONTROL_DIR,\
+                           get_original_filename, fcntl, ESKY_CONTROL_DIR,\
                            ESKY_APPDATA_DIR
 
 
@@ -408,6 +414,8 @@ def get_platform():
     return _CACHED_PLATFORM
 
 
+_CORE_DEP_RE = None
+
 def is_core_dependency(filenm):
     """Check whether than named file is a core python dependency.
 
@@ -415,7 +423,10 @@ def is_core_dependency(filenm):
     bootstrapper).  Currently this includes only the python DLL and the
     MSVCRT private assembly.
     """
-    if re.match("^(lib)?python\\d[\\d\\.]*\\.[a-z\d\\.]*$",filenm):
+    global _CORE_DEP_RE
+    if _CORE_DEP_RE is None:
+        _CORE_DEP_RE = re.compile("^(lib)?python\\d[\\d\\.]*\\.[a-z\d\\.]*$")
+    if _CORE_DEP_RE.match(filenm):
         return True
     if filenm.startswith("Microsoft.") and filenm.endswith(".CRT"):
         return True
@@ -459,6 +470,123 @@ def get_backup_filename(filename):
     return backname
 
 
+#  Filesystem types on which fcntl locking is unreliable, unsupported, or
+#  needlessly expensive (a round-trip to the metadata server).  On these
+#  we lock version dirs with hardlink sentinels instead; link(2) is
+#  atomic even on NFS.
+_NETWORK_FS_TYPES = frozenset(("nfs","nfs2","nfs3","nfs4","lustre",
+                               "smbfs","cifs","smb2","ncpfs","afs",
+                               "glusterfs","fhgfs","beegfs","panfs",
+                               "ceph",))
+
+
+def is_network_fs(path):
+    """Check whether the given path lives on a network filesystem.
+
+    Only implemented on Linux (via /proc/mounts); other platforms simply
+    report False and keep their usual locking strategy.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    path = os.path.abspath(path)
+    best_mp = ""
+    best_is_net = False
+    try:
+        with open("/proc/mounts","r") as f:
+            mounts = f.read()
+    except EnvironmentError:
+        return False
+    for ln in mounts.splitlines():
+        fields = ln.split()
+        if len(fields) < 3:
+            continue
+        mp = fields[1].rstrip("/")
+        if path == mp or path.startswith(mp + "/") or mp == "":
+            if len(mp) >= len(best_mp):
+                best_mp = mp
+                best_is_net = fields[2] in _NETWORK_FS_TYPES
+    return best_is_net
+
+
+#  Hardlink sentinels held by this process, keyed by version dir.
+_sentinel_locks = {}
+
+
+def list_version_dir_sentinels(vdir):
+    """List the live hardlink sentinels held against a version dir.
+
+    Sentinels record their host and pid in their name; any left behind
+    by a dead process on this host are cleaned up along the way.
+    """
+    lockdir = os.path.join(vdir,ESKY_CONTROL_DIR)
+    sentinels = []
+    try:
+        names = os.listdir(lockdir)
+    except EnvironmentError:
+        return sentinels
+    hostname = socket.gethostname()
+    prefix = "lockfile.txt-owner-"
+    for nm in names:
+        if not nm.startswith(prefix):
+            continue
+        fullnm = os.path.join(lockdir,nm)
+        bits = nm[len(prefix):].rsplit("-",1)
+        if len(bits) == 2 and bits[0] == hostname:
+            try:
+                pid = int(bits[1])
+            except ValueError:
+                pid = None
+            if pid is not None and not _pid_exists(pid):
+                try:
+                    os.unlink(fullnm)
+                except EnvironmentError:
+                    pass
+                continue
+        sentinels.append(fullnm)
+    return sentinels
+
+
+def _pid_exists(pid):
+    try:
+        os.kill(pid,0)
+    except OSError, e:
+        return e.errno != errno.ESRCH
+    return True
+
+
+def lock_version_dir(vdir):
+    """Lock the given version dir so it cannot be uninstalled.
+
+    This is the bootstrap-time flock scheme, except on network
+    filesystems where flock is unreliable; there a uniquely-named
+    hardlink of the lockfile marks the version as in use.
+    """
+    if sys.platform != "win32" and is_network_fs(vdir):
+        lockfile = os.path.join(vdir,ESKY_CONTROL_DIR,"lockfile.txt")
+        sentinel = "%s-owner-%s-%s" % (lockfile,socket.gethostname(),
+                                       os.getpid(),)
+        try:
+            os.link(lockfile,sentinel)
+        except EnvironmentError:
+            pass
+        else:
+            _sentinel_locks.setdefault(vdir,[]).append(sentinel)
+            return
+    _bs_lock_version_dir(vdir)
+
+
+def unlock_version_dir(vdir):
+    """Unlock the given version dir, allowing it to be uninstalled."""
+    locks = _sentinel_locks.get(vdir)
+    if locks:
+        try:
+            os.unlink(locks.pop())
+        except EnvironmentError:
+            pass
+        return
+    _bs_unlock_version_dir(vdir)
+
+
 def is_locked_version_dir(vdir):
     """Check whether the given version dir is locked."""
     if sys.platform == "win32":
@@ -470,20 +598,90 @@ def is_locked_version_dir(vdir):
         else:
             return False
     else:
+        #  New eskys on network filesystems hold sentinel hardlinks, but
+        #  the bootstrap exe and older eskys still hold flock locks, so
+        #  a version is in use if either kind of lock is present.
+        on_network_fs = is_network_fs(vdir)
+        if on_network_fs and list_version_dir_sentinels(vdir):
+            return True
         lockfile = os.path.join(vdir,ESKY_CONTROL_DIR,"lockfile.txt")
         f = open(lockfile,"r")
         try:
             fcntl.flock(f,fcntl.LOCK_EX|fcntl.LOCK_NB)
         except EnvironmentError, e:
-            if e.errno not in (errno.EACCES,errno.EAGAIN,):
-                raise
-            return True
+            if e.errno in (errno.EACCES,errno.EAGAIN,):
+                return True
+            if on_network_fs and e.errno in (errno.ENOSYS,
+                                             errno.EOPNOTSUPP,):
+                #  flock can't tell us anything here; the sentinel check
+                #  above is the best information we have.
+                return False
+            raise
         else:
             return False
         finally:
             f.close()
 
 
+#  Machinery for atomic path exchange via the Linux renameat2() syscall.
+#  The loader result is cached module-wide: a callable on success, False
+#  if the platform or libc can't do it.
+_RENAMEAT2 = None
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+#  Syscall numbers for renameat2 on common linux architectures, used
+#  when libc is too old to export a renameat2() wrapper.
+_SYS_RENAMEAT2 = {"x86_64":316,"i386":353,"i686":353,
+                  "armv6l":382,"armv7l":382,"aarch64":276}
+
+
+def _load_renameat2():
+    try:
+        import ctypes
+    except ImportError:
+        return False
+    try:
+        libc = ctypes.CDLL(None,use_errno=True)
+    except (OSError,TypeError):
+        return False
+    try:
+        func = libc.renameat2
+    except AttributeError:
+        try:
+            syscall = libc.syscall
+            nr = _SYS_RENAMEAT2[os.uname()[4]]
+        except (AttributeError,KeyError):
+            return False
+        def func(fd1,p1,fd2,p2,flags,_syscall=syscall,_nr=nr):
+            return _syscall(_nr,fd1,p1,fd2,p2,flags)
+    def exchange(path1,path2):
+        return func(_AT_FDCWD,path1,_AT_FDCWD,path2,_RENAME_EXCHANGE) == 0
+    return exchange
+
+
+def atomic_exchange(path1,path2):
+    """Atomically exchange two filesystem paths, where the platform allows.
+
+    On Linux this issues the renameat2() syscall with the RENAME_EXCHANGE
+    flag, swapping the two names in a single atomic step.  Returns True on
+    success, or False if the platform, libc or filesystem can't do the
+    exchange; callers are expected to fall back to their usual
+    rename-aside dance.
+    """
+    global _RENAMEAT2
+    if not sys.platform.startswith("linux"):
+        return False
+    if _RENAMEAT2 is None:
+        _RENAMEAT2 = _load_renameat2()
+    if not _RENAMEAT2:
+        return False
+    if isinstance(path1,unicode):
+        path1 = path1.encode(sys.getfilesystemencoding())
+    if isinstance(path2,unicode):
+        path2 = path2.encode(sys.getfilesystemencoding())
+    return _RENAMEAT2(path1,path2)
+
+
 def really_rename(source,target):
     """Like os.rename, but try to work around some win32 wierdness.
 